@@ -1,6 +1,9 @@
+from collections import namedtuple
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
 from nucleo.insights import GeneradorInsights
 from nucleo.pronostico import PronosticadorVentasLineal
 
@@ -10,6 +13,13 @@ from nucleo.fuentes import FuenteDatosCSV, ErrorValidacionDatos, ErrorFuenteDato
 from nucleo.etl import LimpiadorDatos, TransformadorVentas
 from nucleo.filtros import FiltroDatos, FiltroSeleccion, ComparadorPeriodos
 
+# Resultado del pipeline cacheado: la tabla lista para BI junto con los
+# escalares/listas que la sidebar necesita en cada rerun sin re-escanear
+DatosPreparados = namedtuple(
+    "DatosPreparados",
+    ["tabla", "advertencias", "fecha_min", "fecha_max", "regiones", "canales", "productos"]
+)
+
 
 # =========================
 # CONFIGURACIÓN STREAMLIT
@@ -43,20 +53,68 @@ archivo_subido = st.sidebar.file_uploader(
 
 
 # =========================
-# CARGA + VALIDACIÓN + NORMALIZACIÓN
+# CARGA + VALIDACIÓN + ETL (CACHEADO COMPLETO)
 # =========================
 @st.cache_data
-def cargar_datos(archivo):
+def preparar_datos(archivo):
+    """
+    Pipeline completo: carga + limpieza + transformación.
+
+    Se cachea el resultado final (y no solo la carga) para que el ETL
+    no se repita en cada rerun de Streamlit al mover un filtro. Junto a
+    la tabla viajan los límites de fecha y las opciones de los
+    selectores, pre-calculados aquí una sola vez.
+    """
     fuente = FuenteDatosCSV(
         configuracion=configuracion,
         esquema=esquema,
         archivo_subido=archivo
     )
-    return fuente.cargar()
+    tabla = fuente.cargar()
+
+    limpiador = LimpiadorDatos()
+    tabla, resultado_limpieza = limpiador.limpiar(
+        tabla,
+        formato_fecha=configuracion.formato_fecha
+    )
+
+    transformador = TransformadorVentas()
+    tabla = transformador.transformar(tabla)
+
+    # Ordenada por fecha una sola vez: permite recortar rangos de fechas
+    # por búsqueda binaria en lugar de máscaras O(N) en cada rerun.
+    tabla = tabla.sort_values("fecha", ignore_index=True)
+
+    return DatosPreparados(
+        tabla=tabla,
+        advertencias=resultado_limpieza.advertencias,
+        # Tabla ordenada por fecha: los límites son los extremos, O(1)
+        fecha_min=tabla["fecha"].iloc[0] if not tabla.empty else pd.NaT,
+        fecha_max=tabla["fecha"].iloc[-1] if not tabla.empty else pd.NaT,
+        # Columnas 'category': las categorías ya son los únicos
+        regiones=sorted(tabla["region"].cat.categories.tolist()),
+        canales=sorted(tabla["canal"].cat.categories.tolist()),
+        productos=sorted(tabla["id_producto"].cat.categories.tolist()),
+    )
 
 
 try:
-    tabla_normalizada = cargar_datos(archivo_subido)
+    # Singleton en session_state: mantiene el MISMO objeto DataFrame entre
+    # reruns y evita la copia que st.cache_data hace en cada llamada.
+    # 'clave_datos' identifica el dataset de forma estable y sirve de
+    # clave para todos los cachés aguas abajo.
+    clave_datos = archivo_subido.file_id if archivo_subido is not None else "__csv_por_defecto__"
+    if st.session_state.get("clave_datos") != clave_datos:
+        # La clave se registra DESPUÉS de preparar los datos: si la carga
+        # falla, el próximo rerun vuelve a intentarla (y a mostrar el
+        # error) en lugar de dar por bueno el archivo y servir en
+        # silencio el dataset anterior.
+        datos_preparados = preparar_datos(archivo_subido)
+        st.session_state["clave_datos"] = clave_datos
+        st.session_state["datos_preparados"] = datos_preparados
+    datos = st.session_state["datos_preparados"]
+    tabla_final = datos.tabla
+    advertencias_limpieza = datos.advertencias
 except ErrorValidacionDatos as e:
     st.error("❌ El archivo CSV no cumple el formato requerido.")
     st.write("Errores encontrados:")
@@ -69,19 +127,10 @@ except ErrorFuenteDatos as e:
     st.stop()
 
 
-# =========================
-# ETL: LIMPIEZA + TRANSFORMACIÓN
-# =========================
-limpiador = LimpiadorDatos()
-tabla_limpia, resultado_limpieza = limpiador.limpiar(tabla_normalizada)
-
-transformador = TransformadorVentas()
-tabla_final = transformador.transformar(tabla_limpia)
-
 # Advertencias de limpieza
-if resultado_limpieza.advertencias:
+if advertencias_limpieza:
     with st.expander("⚠️ Advertencias de limpieza"):
-        for adv in resultado_limpieza.advertencias:
+        for adv in advertencias_limpieza:
             st.write(f"- {adv}")
 
 
@@ -90,8 +139,10 @@ if resultado_limpieza.advertencias:
 # =========================
 st.sidebar.header("Filtros")
 
-fecha_min = tabla_final["fecha"].min()
-fecha_max = tabla_final["fecha"].max()
+# Todo pre-calculado en preparar_datos: cero scans por rerun
+regiones, canales, productos = datos.regiones, datos.canales, datos.productos
+fecha_min = datos.fecha_min
+fecha_max = datos.fecha_max
 
 rango = st.sidebar.date_input(
     "Rango de fechas",
@@ -108,23 +159,48 @@ else:
 
 region = st.sidebar.selectbox(
     "Región",
-    options=["Todas"] + sorted(tabla_final["region"].dropna().unique().tolist())
+    options=["Todas"] + regiones
 )
 
 canal = st.sidebar.selectbox(
     "Canal",
-    options=["Todos"] + sorted(tabla_final["canal"].dropna().unique().tolist())
+    options=["Todos"] + canales
 )
 
 producto = st.sidebar.selectbox(
     "Producto",
-    options=["Todos"] + sorted(tabla_final["id_producto"].dropna().unique().tolist())
+    options=["Todos"] + productos
 )
 
 
 # =========================
 # APLICACIÓN DE FILTROS
 # =========================
+@st.cache_data
+def filtrar_dimensiones(_tabla, clave_datos, region, canal, id_producto):
+    """
+    Versión memoizada del filtro dimensional (región/canal/producto).
+
+    '_tabla' no se hashea (prefijo '_'); la identidad de los datos entra
+    vía 'clave_datos' (el file_id del archivo, estable entre sesiones —
+    id() no sirve: CPython recicla ids y el caché es global). Las fechas
+    NO participan: el recorte por fechas se hace después por búsqueda
+    binaria, así el período actual y el anterior comparten este mismo
+    resultado.
+    """
+    filtro_datos = FiltroDatos()
+    return filtro_datos.aplicar_dimensiones(
+        _tabla,
+        FiltroSeleccion(
+            fecha_inicio=pd.Timestamp.min,
+            fecha_fin=pd.Timestamp.max,
+            region=region,
+            canal=canal,
+            id_producto=id_producto
+        )
+    )
+
+
 filtros = FiltroSeleccion(
     fecha_inicio=pd.to_datetime(fecha_inicio),
     fecha_fin=pd.to_datetime(fecha_fin),
@@ -134,7 +210,12 @@ filtros = FiltroSeleccion(
 )
 
 filtro_datos = FiltroDatos()
-tabla_filtrada = filtro_datos.aplicar(tabla_final, filtros)
+tabla_dimensiones = filtrar_dimensiones(tabla_final, clave_datos, region, canal, producto)
+tabla_filtrada = filtro_datos.recortar_por_fechas(
+    tabla_dimensiones,
+    filtros.fecha_inicio,
+    filtros.fecha_fin
+)
 
 
 # =========================
@@ -146,37 +227,42 @@ comparador = ComparadorPeriodos()
     filtros.fecha_fin
 )
 
-tabla_anterior = filtro_datos.aplicar(
-    tabla_final,
-    FiltroSeleccion(
-        fecha_inicio=periodo_anterior[0],
-        fecha_fin=periodo_anterior[1],
-        region=region,
-        canal=canal,
-        id_producto=producto
-    )
+tabla_anterior = filtro_datos.recortar_por_fechas(
+    tabla_dimensiones,
+    periodo_anterior[0],
+    periodo_anterior[1]
 )
 
 # =========================
 # KPIs (con comparación)
 # =========================
-def _comparar_kpi(columna: str) -> dict:
-    actual = float(tabla_filtrada[columna].sum()) if not tabla_filtrada.empty else 0.0
-    anterior = float(tabla_anterior[columna].sum()) if not tabla_anterior.empty else 0.0
-    return comparador.comparar_metricas(actual, anterior)
-
-
-comparacion_ingresos = _comparar_kpi("ingresos")
-comparacion_margen = _comparar_kpi("margen")
-
-clientes_activos = int(tabla_filtrada["id_cliente"].nunique()) if not tabla_filtrada.empty else 0
-pedidos = int(tabla_filtrada["id_orden"].nunique()) if not tabla_filtrada.empty else 0
-
-clientes_activos_anterior = int(tabla_anterior["id_cliente"].nunique()) if not tabla_anterior.empty else 0
-pedidos_anterior = int(tabla_anterior["id_orden"].nunique()) if not tabla_anterior.empty else 0
-
-comparacion_clientes = comparador.comparar_metricas(clientes_activos, clientes_activos_anterior)
-comparacion_pedidos = comparador.comparar_metricas(pedidos, pedidos_anterior)
+def _calcular_kpis(tabla: pd.DataFrame) -> dict:
+    """
+    Los 4 KPIs en una sola pasada de agregación (en lugar de 4 scans
+    independientes por tabla). Sobre una tabla vacía agg devuelve 0s,
+    así que no hacen falta chequeos de .empty por métrica.
+    """
+    agregados = tabla.agg({
+        "ingresos": "sum",
+        "margen": "sum",
+        "id_cliente": "nunique",
+        "id_orden": "nunique",
+    })
+    return {
+        "ingresos": float(agregados["ingresos"]),
+        "margen": float(agregados["margen"]),
+        "clientes": int(agregados["id_cliente"]),
+        "pedidos": int(agregados["id_orden"]),
+    }
+
+
+kpis_actual = _calcular_kpis(tabla_filtrada)
+kpis_anterior = _calcular_kpis(tabla_anterior)
+
+comparacion_ingresos = comparador.comparar_metricas(kpis_actual["ingresos"], kpis_anterior["ingresos"])
+comparacion_margen = comparador.comparar_metricas(kpis_actual["margen"], kpis_anterior["margen"])
+comparacion_clientes = comparador.comparar_metricas(kpis_actual["clientes"], kpis_anterior["clientes"])
+comparacion_pedidos = comparador.comparar_metricas(kpis_actual["pedidos"], kpis_anterior["pedidos"])
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -237,34 +323,92 @@ st.markdown("---")
 # =========================
 # GRÁFICOS (RESPETAN FILTROS)
 # =========================
+@st.cache_resource
+def figura_linea(_datos, clave, columna, titulo):
+    """
+    Figura de línea cacheada por (dataset, filtros, métrica): construir
+    el objeto plotly (y su JSON) es caro y no cambia si los filtros no
+    cambian.
+
+    Usa Scattergl (WebGL) en vez de px.line: el navegador renderiza en
+    GPU y el trazado directo evita el overhead de plotly express. Los
+    marcadores se apagan en series largas para no saturar el render.
+    """
+    modo = "lines+markers" if len(_datos) <= 500 else "lines"
+    figura = go.Figure(
+        go.Scattergl(x=_datos["fecha"], y=_datos[columna], mode=modo)
+    )
+    figura.update_layout(title=titulo, xaxis_title="fecha", yaxis_title=columna)
+    return figura
+
+
+@st.cache_resource
+def figura_barras(_datos, clave, x, titulo):
+    """Figura de barras cacheada por (dataset, filtros, dimensión)."""
+    return px.bar(_datos, x=x, y="ingresos", title=titulo)
+
+
+@st.cache_data
+def csv_para_descarga(_datos, clave):
+    """
+    Serializa el resumen a CSV una sola vez por combinación de filtros:
+    sin caché, to_csv corría en cada rerun aunque nadie descargara.
+    """
+    return _datos.to_csv(index=False).encode("utf-8")
+
+
+# Firma de los filtros activos: clave de caché para las figuras.
+# 'clave_datos' y no id(): los cachés de Streamlit son globales entre
+# sesiones y CPython recicla ids, así que un id reusado podría servir
+# artefactos calculados sobre otro dataset.
+clave_filtros = (
+    clave_datos,
+    filtros.fecha_inicio,
+    filtros.fecha_fin,
+    region,
+    canal,
+    producto,
+)
+
 st.subheader("📈 Análisis visual (según filtros)")
 
 if tabla_filtrada.empty:
     st.info("No hay datos para los filtros seleccionados.")
 else:
+    # ---- 0) Cubo base: una sola pasada sobre tabla_filtrada ----
+    # Las métricas aditivas (ingresos, margen, cantidad) se agregan una
+    # vez por (fecha, región, canal, producto) y cada gráfico hace su
+    # roll-up sobre este cubo pequeño en lugar de re-escanear la tabla
+    # completa. 'pedidos' (nunique) no es aditivo y se calcula aparte.
+    cubo_base = (
+        tabla_filtrada.groupby(
+            ["fecha", "region", "canal", "id_producto"],
+            as_index=False,
+            observed=True,
+            sort=False
+        )
+        .agg(
+            ingresos=("ingresos", "sum"),
+            margen=("margen", "sum"),
+            cantidad_total=("cantidad", "sum")
+        )
+    )
+
     # ---- 1) Tendencia: ingresos y margen por día ----
     st.markdown("### Tendencia (Ingresos y Margen)")
     resumen_diario = (
-        tabla_filtrada.groupby("fecha", as_index=False)
-        .agg(ingresos=("ingresos", "sum"), margen=("margen", "sum"))
+        cubo_base.groupby("fecha", as_index=False, sort=False)[["ingresos", "margen"]]
+        .sum()
         .sort_values("fecha")
     )
 
-    grafico_tendencia_ingresos = px.line(
-        resumen_diario,
-        x="fecha",
-        y="ingresos",
-        markers=True,
-        title="Ingresos por día"
+    grafico_tendencia_ingresos = figura_linea(
+        resumen_diario, clave_filtros, "ingresos", "Ingresos por día"
     )
     st.plotly_chart(grafico_tendencia_ingresos, use_container_width=True)
 
-    grafico_tendencia_margen = px.line(
-        resumen_diario,
-        x="fecha",
-        y="margen",
-        markers=True,
-        title="Margen por día"
+    grafico_tendencia_margen = figura_linea(
+        resumen_diario, clave_filtros, "margen", "Margen por día"
     )
     st.plotly_chart(grafico_tendencia_margen, use_container_width=True)
 
@@ -273,16 +417,13 @@ else:
     # ---- 2) Ingresos por región ----
     st.markdown("### Ingresos por región")
     resumen_region = (
-        tabla_filtrada.groupby("region", as_index=False)
-        .agg(ingresos=("ingresos", "sum"), margen=("margen", "sum"))
+        cubo_base.groupby("region", as_index=False, observed=True, sort=False)[["ingresos", "margen"]]
+        .sum()
         .sort_values("ingresos", ascending=False)
     )
 
-    grafico_region = px.bar(
-        resumen_region,
-        x="region",
-        y="ingresos",
-        title="Ingresos por región"
+    grafico_region = figura_barras(
+        resumen_region, clave_filtros, "region", "Ingresos por región"
     )
     st.plotly_chart(grafico_region, use_container_width=True)
 
@@ -291,16 +432,13 @@ else:
     # ---- 3) Ingresos por canal ----
     st.markdown("### Ingresos por canal")
     resumen_canal = (
-        tabla_filtrada.groupby("canal", as_index=False)
-        .agg(ingresos=("ingresos", "sum"), margen=("margen", "sum"))
+        cubo_base.groupby("canal", as_index=False, observed=True, sort=False)[["ingresos", "margen"]]
+        .sum()
         .sort_values("ingresos", ascending=False)
     )
 
-    grafico_canal = px.bar(
-        resumen_canal,
-        x="canal",
-        y="ingresos",
-        title="Ingresos por canal"
+    grafico_canal = figura_barras(
+        resumen_canal, clave_filtros, "canal", "Ingresos por canal"
     )
     st.plotly_chart(grafico_canal, use_container_width=True)
 
@@ -309,16 +447,14 @@ else:
     # ---- 4) Top productos ----
     st.markdown("### Top productos (Ingresos y Margen)")
     top_productos = (
-        tabla_filtrada.groupby("id_producto", as_index=False)
-        .agg(
-            ingresos=("ingresos", "sum"),
-            margen=("margen", "sum"),
-            cantidad_total=("cantidad", "sum"),
-            pedidos=("id_orden", "nunique")
-        )
+        cubo_base.groupby("id_producto", as_index=False, observed=True, sort=False)[["ingresos", "margen", "cantidad_total"]]
+        .sum()
         .sort_values("ingresos", ascending=False)
         .head(configuracion.cantidad_top_productos)
     )
+    # nunique de órdenes solo para los top (no se puede sumar desde el cubo)
+    pedidos_por_producto = tabla_filtrada.groupby("id_producto", observed=True, sort=False)["id_orden"].nunique()
+    top_productos["pedidos"] = top_productos["id_producto"].map(pedidos_por_producto).astype(int)
 
     colA, colB = st.columns((1, 2))
 
@@ -326,11 +462,11 @@ else:
         st.dataframe(top_productos)
 
     with colB:
-        grafico_top_productos = px.bar(
+        grafico_top_productos = figura_barras(
             top_productos,
-            x="id_producto",
-            y="ingresos",
-            title=f"Top {configuracion.cantidad_top_productos} productos por ingresos"
+            clave_filtros,
+            "id_producto",
+            f"Top {configuracion.cantidad_top_productos} productos por ingresos"
         )
         st.plotly_chart(grafico_top_productos, use_container_width=True)
 
@@ -339,7 +475,7 @@ else:
     # ---- 5) (Opcional útil) Tabla resumen para exportar ----
     with st.expander("📄 Resumen para exportar"):
         st.dataframe(resumen_diario)
-        csv = resumen_diario.to_csv(index=False).encode("utf-8")
+        csv = csv_para_descarga(resumen_diario, clave_filtros)
         st.download_button(
             "Descargar resumen diario (CSV)",
             data=csv,
@@ -350,6 +486,17 @@ else:
 # =========================
 # PRONÓSTICO DE INGRESOS
 # =========================
+@st.cache_data
+def pronosticar(_tabla, clave, dias_futuros):
+    """
+    Pronóstico memoizado por (dataset, filtros, días): la agregación
+    diaria y el ajuste del modelo no cambian entre reruns si los filtros
+    y el slider no cambian.
+    """
+    pronosticador = PronosticadorVentasLineal()
+    return pronosticador.entrenar_y_pronosticar(_tabla, dias_futuros=dias_futuros)
+
+
 st.subheader("🔮 Pronóstico de ingresos")
 
 if tabla_filtrada.empty:
@@ -364,11 +511,7 @@ else:
     )
 
     try:
-        pronosticador = PronosticadorVentasLineal()
-        resultado = pronosticador.entrenar_y_pronosticar(
-            tabla_filtrada,
-            dias_futuros=dias_pronostico
-        )
+        resultado = pronosticar(tabla_filtrada, clave_filtros, dias_pronostico)
 
         import plotly.express as px
 
@@ -0,0 +1,56 @@
+"""
+Kernels numéricos compilados con Numba (opcionales).
+
+Si numba está instalado, la suma agrupada corre como código nativo
+multihilo; el dispatcher de numba cachea la compilación por proceso, así
+el costo de compilar se paga solo en la primera llamada (cache=True en
+disco no es posible aquí: el kernel paralelo usa estado de threading que
+numba no puede serializar). Si no está instalado, se usa np.bincount,
+que ya es un kernel C decente.
+
+Los llamadores importan solo `suma_agrupada`; la elección de backend
+queda encapsulada aquí.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+try:
+    import numba
+
+    _NUMBA_DISPONIBLE = True
+except ImportError:  # pragma: no cover
+    _NUMBA_DISPONIBLE = False
+
+
+if _NUMBA_DISPONIBLE:
+
+    @numba.njit(parallel=True)
+    def _suma_agrupada_jit(valores, codigos, n_grupos):  # pragma: no cover
+        n_hilos = numba.get_num_threads()
+        # Buffer local por hilo: evita escrituras atómicas al acumular
+        parciales = np.zeros((n_hilos, n_grupos), dtype=np.float64)
+        for i in numba.prange(valores.shape[0]):
+            hilo = numba.get_thread_id()
+            parciales[hilo, codigos[i]] += valores[i]
+        return parciales.sum(axis=0)
+
+    def suma_agrupada(valores: np.ndarray, codigos: np.ndarray, n_grupos: int) -> np.ndarray:
+        """
+        Suma 'valores' por grupo según 'codigos' (0..n_grupos-1).
+        Equivalente a np.bincount(codigos, weights=valores, minlength=n_grupos).
+        """
+        return _suma_agrupada_jit(
+            np.ascontiguousarray(valores, dtype=np.float64),
+            np.ascontiguousarray(codigos, dtype=np.int64),
+            n_grupos,
+        )
+
+else:
+
+    def suma_agrupada(valores: np.ndarray, codigos: np.ndarray, n_grupos: int) -> np.ndarray:
+        """
+        Suma 'valores' por grupo según 'codigos' (0..n_grupos-1).
+        Fallback sin numba: np.bincount con pesos.
+        """
+        return np.bincount(codigos, weights=valores, minlength=n_grupos)
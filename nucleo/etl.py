@@ -3,6 +3,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import List, Optional
 
+import numpy as np
 import pandas as pd
 
 
@@ -23,15 +24,44 @@ class LimpiadorDatos:
     - Convierte columnas numéricas a número
     - Maneja nulos
     - Elimina filas inválidas (por ejemplo sin fecha o cantidad negativa si no se permite)
+
+    Contrato: 'limpiar' consume su entrada (puede mutar columnas del
+    DataFrame recibido). Si el llamador necesita conservar el original,
+    debe copiarlo él mismo; así el ETL no duplica la tabla completa.
     """
 
-    def limpiar(self, tabla: pd.DataFrame) -> tuple[pd.DataFrame, ResultadoLimpieza]:
-        tabla = tabla.copy()
+    def limpiar(
+        self,
+        tabla: pd.DataFrame,
+        formato_fecha: Optional[str] = None
+    ) -> tuple[pd.DataFrame, ResultadoLimpieza]:
         advertencias: List[str] = []
         filas_iniciales = len(tabla)
 
-        # 1) Fecha: convertir y eliminar filas sin fecha válida
-        tabla["fecha"] = pd.to_datetime(tabla["fecha"], errors="coerce")
+        # 1) Fecha: convertir y eliminar filas sin fecha válida.
+        # Con formato declarado (o el fast-path ISO8601) pandas evita el
+        # parseo por inferencia elemento a elemento; cache=True parsea
+        # los strings repetidos una sola vez.
+        dtype_fecha = tabla["fecha"].dtype
+        if isinstance(dtype_fecha, np.dtype) and dtype_fecha.kind == "M":
+            pass  # ya es datetime64 de numpy, nada que parsear
+        elif pd.api.types.is_datetime64_any_dtype(dtype_fecha):
+            # Fecha respaldada por Arrow (date32/timestamp): parseada,
+            # pero no comparable con los Timestamps numpy que usan los
+            # recortes por fecha; normalizar a datetime64[ns]
+            tabla["fecha"] = tabla["fecha"].astype("datetime64[ns]")
+        else:
+            fechas = pd.to_datetime(
+                tabla["fecha"],
+                format=formato_fecha or "ISO8601",
+                errors="coerce",
+                cache=True
+            )
+            if formato_fecha is None and fechas.isna().all() and tabla["fecha"].notna().any():
+                # CSV con fechas no-ISO y sin formato configurado:
+                # caer al parseo con inferencia antes de descartar todo
+                fechas = pd.to_datetime(tabla["fecha"], errors="coerce", cache=True)
+            tabla["fecha"] = fechas
         filas_sin_fecha = tabla["fecha"].isna().sum()
         if filas_sin_fecha > 0:
             advertencias.append(
@@ -39,41 +69,54 @@ class LimpiadorDatos:
             )
         tabla = tabla.dropna(subset=["fecha"])
 
-        # 2) Convertir numéricos (cantidad, precio, costo)
-        for col in ["cantidad", "precio", "costo"]:
-            tabla[col] = pd.to_numeric(tabla[col], errors="coerce")
-
-            nulos = tabla[col].isna().sum()
+        # 2) Convertir numéricos (cantidad, precio, costo) en bloque:
+        # una conversión, un conteo de nulos y un fillna para las tres
+        # columnas, en lugar de tres pasadas por columna.
+        # downcast="float" deja las columnas en float32: la mitad de RAM
+        # y sumas/groupbys más rápidos, precisión de sobra para montos BI
+        columnas_numericas = ["cantidad", "precio", "costo"]
+        numericos = tabla[columnas_numericas].apply(
+            pd.to_numeric, errors="coerce", downcast="float"
+        )
+        if any(not isinstance(dt, np.dtype) for dt in numericos.dtypes):
+            # to_numeric preserva el backend Arrow de la entrada, y sus
+            # NaN de coerción no se reportan en isna() (Arrow distingue
+            # NaN de nulo): en float32 numpy ambos son la misma cosa y
+            # el conteo/fillna de abajo los repara como siempre
+            numericos = numericos.astype(np.float32)
+
+        nulos_por_columna = numericos.isna().sum()
+        for col, nulos in nulos_por_columna.items():
             if nulos > 0:
                 advertencias.append(
                     f"Se encontraron {nulos} valores no numéricos/vacíos en '{col}'; se reemplazaron por 0."
                 )
-                tabla[col] = tabla[col].fillna(0)
+
+        tabla[columnas_numericas] = numericos.fillna(0)
 
         # 3) Reglas básicas de sentido (ajustables)
         # Cantidad negativa: normalmente es error, pero podría ser devolución.
-        # Por ahora, eliminamos filas con cantidad < 0.
-        negativas = (tabla["cantidad"] < 0).sum()
-        if negativas > 0:
+        # Precio o costo negativo: muy raro. Eliminamos.
+        # Una sola máscara combinada: tres filtros encadenados
+        # materializaban tres DataFrames intermedios.
+        negativos = tabla[columnas_numericas] < 0
+        conteo_negativos = negativos.sum()
+
+        if conteo_negativos["cantidad"] > 0:
             advertencias.append(
-                f"Se encontraron {negativas} filas con 'cantidad' negativa; fueron eliminadas."
+                f"Se encontraron {conteo_negativos['cantidad']} filas con 'cantidad' negativa; fueron eliminadas."
             )
-            tabla = tabla[tabla["cantidad"] >= 0]
-
-        # Precio o costo negativo: muy raro. Eliminamos.
-        precio_neg = (tabla["precio"] < 0).sum()
-        costo_neg = (tabla["costo"] < 0).sum()
-        if precio_neg > 0:
+        if conteo_negativos["precio"] > 0:
             advertencias.append(
-                f"Se encontraron {precio_neg} filas con 'precio' negativo; fueron eliminadas."
+                f"Se encontraron {conteo_negativos['precio']} filas con 'precio' negativo; fueron eliminadas."
             )
-            tabla = tabla[tabla["precio"] >= 0]
-
-        if costo_neg > 0:
+        if conteo_negativos["costo"] > 0:
             advertencias.append(
-                f"Se encontraron {costo_neg} filas con 'costo' negativo; fueron eliminadas."
+                f"Se encontraron {conteo_negativos['costo']} filas con 'costo' negativo; fueron eliminadas."
             )
-            tabla = tabla[tabla["costo"] >= 0]
+
+        if conteo_negativos.any():
+            tabla = tabla[~negativos.any(axis=1)]
 
         filas_finales = len(tabla)
         filas_eliminadas = filas_iniciales - filas_finales
@@ -90,18 +133,40 @@ class TransformadorVentas:
     - ingresos = cantidad * precio
     - costo_total = cantidad * costo
     - margen = ingresos - costo_total
+
+    Contrato: igual que LimpiadorDatos, 'transformar' consume su entrada
+    (agrega columnas sobre el DataFrame recibido) para no duplicar la
+    tabla en memoria.
     """
 
     def transformar(self, tabla: pd.DataFrame) -> pd.DataFrame:
-        tabla = tabla.copy()
-
-        tabla["ingresos"] = tabla["cantidad"] * tabla["precio"]
-        tabla["costo_total"] = tabla["cantidad"] * tabla["costo"]
-        tabla["margen"] = tabla["ingresos"] - tabla["costo_total"]
+        # eval solo usa numexpr con dtypes numpy: con columnas de
+        # extensión (p. ej. backend Arrow del lector) degradaría al motor
+        # python con un RuntimeWarning por llamada. Materializarlas antes
+        # mantiene la vía rápida.
+        for col in ("cantidad", "precio", "costo"):
+            if not isinstance(tabla[col].dtype, np.dtype):
+                tabla[col] = tabla[col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+        # Las tres columnas derivadas en una sola expresión: con numexpr
+        # disponible, pandas fusiona la aritmética en una única pasada
+        # sobre memoria en lugar de tres operaciones elemento a elemento.
+        tabla.eval(
+            "ingresos = cantidad * precio\n"
+            "costo_total = cantidad * costo\n"
+            "margen = ingresos - costo_total",
+            inplace=True
+        )
 
-        # margen_porcentaje (útil para análisis)
-        tabla["margen_porcentaje"] = 0.0
-        mask = tabla["ingresos"] > 0
-        tabla.loc[mask, "margen_porcentaje"] = tabla.loc[mask, "margen"] / tabla.loc[mask, "ingresos"]
+        # margen_porcentaje (útil para análisis): una sola división
+        # vectorizada con 'where' en lugar de máscara + asignación indexada
+        ingresos = tabla["ingresos"].to_numpy(dtype=np.float64)
+        margen = tabla["margen"].to_numpy(dtype=np.float64)
+        tabla["margen_porcentaje"] = np.divide(
+            margen,
+            ingresos,
+            out=np.zeros_like(ingresos),
+            where=ingresos > 0
+        )
 
         return tabla
@@ -4,6 +4,7 @@ from dataclasses import dataclass
 from datetime import timedelta
 from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 
@@ -24,28 +25,88 @@ class FiltroDatos:
     Aplica filtros sobre el DataFrame sin modificar el original.
     """
 
+    @staticmethod
+    def _mascara_igualdad(columna: pd.Series, valor) -> np.ndarray:
+        """
+        Máscara de igualdad como ndarray booleano contiguo.
+
+        Para columnas 'category' compara los códigos enteros (int8/int16)
+        contra el código del valor buscado — comparación SIMD de enteros
+        en lugar de igualdad de strings. Un valor que no está entre las
+        categorías produce directamente una máscara vacía.
+        """
+        if isinstance(columna.dtype, pd.CategoricalDtype):
+            try:
+                codigo = columna.cat.categories.get_loc(valor)
+            except KeyError:
+                return np.zeros(len(columna), dtype=bool)
+            return columna.cat.codes.to_numpy() == codigo
+
+        return columna.to_numpy() == valor
+
     def aplicar(self, tabla: pd.DataFrame, filtros: FiltroSeleccion) -> pd.DataFrame:
-        tabla_filtrada = tabla.copy()
+        # Un solo bitmap acumulado con &= sobre arrays contiguos: sin
+        # copy() inicial y sin materializar DataFrames intermedios.
 
         # Filtro por fechas
-        tabla_filtrada = tabla_filtrada[
-            (tabla_filtrada["fecha"] >= filtros.fecha_inicio) &
-            (tabla_filtrada["fecha"] <= filtros.fecha_fin)
-        ]
+        fechas = tabla["fecha"].to_numpy()
+        mascara = (fechas >= filtros.fecha_inicio) & (fechas <= filtros.fecha_fin)
 
         # Filtro por región
         if filtros.region and filtros.region != "Todas":
-            tabla_filtrada = tabla_filtrada[tabla_filtrada["region"] == filtros.region]
+            mascara &= self._mascara_igualdad(tabla["region"], filtros.region)
 
         # Filtro por canal
         if filtros.canal and filtros.canal != "Todos":
-            tabla_filtrada = tabla_filtrada[tabla_filtrada["canal"] == filtros.canal]
+            mascara &= self._mascara_igualdad(tabla["canal"], filtros.canal)
 
         # Filtro por producto
         if filtros.id_producto and filtros.id_producto != "Todos":
-            tabla_filtrada = tabla_filtrada[tabla_filtrada["id_producto"] == filtros.id_producto]
+            mascara &= self._mascara_igualdad(tabla["id_producto"], filtros.id_producto)
+
+        return tabla.iloc[np.flatnonzero(mascara)]
 
-        return tabla_filtrada
+    def aplicar_dimensiones(self, tabla: pd.DataFrame, filtros: FiltroSeleccion) -> pd.DataFrame:
+        """
+        Aplica solo los filtros dimensionales (región/canal/producto),
+        ignorando las fechas. Útil para filtrar una vez por dimensiones
+        y luego recortar varios rangos de fechas sobre el resultado.
+        """
+        mascara: Optional[np.ndarray] = None
+
+        if filtros.region and filtros.region != "Todas":
+            mascara = self._mascara_igualdad(tabla["region"], filtros.region)
+
+        if filtros.canal and filtros.canal != "Todos":
+            mascara_canal = self._mascara_igualdad(tabla["canal"], filtros.canal)
+            mascara = mascara_canal if mascara is None else mascara & mascara_canal
+
+        if filtros.id_producto and filtros.id_producto != "Todos":
+            mascara_producto = self._mascara_igualdad(tabla["id_producto"], filtros.id_producto)
+            mascara = mascara_producto if mascara is None else mascara & mascara_producto
+
+        if mascara is None:
+            return tabla
+
+        return tabla.iloc[np.flatnonzero(mascara)]
+
+    def recortar_por_fechas(
+        self,
+        tabla: pd.DataFrame,
+        fecha_inicio: pd.Timestamp,
+        fecha_fin: pd.Timestamp
+    ) -> pd.DataFrame:
+        """
+        Recorta un rango de fechas por búsqueda binaria (O(log N)).
+
+        Requiere que 'tabla' esté ordenada por 'fecha' ascendente (el
+        pipeline de preparación ya la entrega así): en vez de construir
+        una máscara booleana completa, dos searchsorted dan el slice.
+        """
+        fechas = tabla["fecha"].values
+        inicio = fechas.searchsorted(np.datetime64(fecha_inicio), side="left")
+        fin = fechas.searchsorted(np.datetime64(fecha_fin), side="right")
+        return tabla.iloc[inicio:fin]
 
 
 class ComparadorPeriodos:
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import csv
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, BinaryIO, List, Any
+from typing import Optional, BinaryIO, List, Any, Tuple
 
 import pandas as pd
 
+try:
+    # Opcional: detección de codificación más robusta que probar a ciegas
+    from charset_normalizer import from_bytes as _detectar_bytes
+except ImportError:  # pragma: no cover
+    _detectar_bytes = None
+
 from nucleo.configuracion import ConfiguracionAplicacion
 from nucleo.contratos import FuenteDatos, EsquemaDatosVentas
 from nucleo.normalizacion import NormalizadorColumnas
@@ -51,6 +58,20 @@ class FuenteDatosCSV(FuenteDatos):
     raiz_proyecto: Optional[Path] = None
 
     def cargar(self) -> pd.DataFrame:
+        # 0) Caché Parquet entre sesiones (solo para el CSV por defecto):
+        # si hay un .parquet más reciente que el CSV, cargarlo directo.
+        # El parquet se escribió ya normalizado y validado. Ojo: la ida y
+        # vuelta puede degradar algún dtype respecto a la ruta CSV (p. ej.
+        # una columna category de enteros puede volver como int64); el
+        # ETL posterior tolera ambas formas.
+        ruta_parquet = self._ruta_parquet()
+        if ruta_parquet is not None and self._parquet_vigente(ruta_parquet):
+            try:
+                return pd.read_parquet(ruta_parquet, engine="pyarrow")
+            except Exception:
+                # Parquet corrupto o ilegible: re-parsear el CSV
+                pass
+
         # 1) Leer CSV (tolerante a encoding y separadores)
         tabla = self._leer_csv()
 
@@ -65,8 +86,46 @@ class FuenteDatosCSV(FuenteDatos):
         if not resultado.es_valido:
             raise ErrorValidacionDatos(resultado.errores)
 
+        # 4) Persistir a Parquet para acelerar el próximo arranque
+        if ruta_parquet is not None:
+            self._escribir_parquet(tabla, ruta_parquet)
+
         return tabla
 
+    # =========================
+    # CACHÉ PARQUET
+    # =========================
+
+    def _ruta_parquet(self) -> Optional[Path]:
+        """
+        Ruta del Parquet espejo del CSV por defecto, o None si los datos
+        vienen de un archivo subido (no hay ruta estable que cachear).
+        """
+        if self.archivo_subido is not None:
+            return None
+        ruta_csv = self.configuracion.ruta_csv_absoluta(self.raiz_proyecto)
+        return ruta_csv.with_suffix(".parquet")
+
+    def _parquet_vigente(self, ruta_parquet: Path) -> bool:
+        """True si el Parquet existe y es más reciente que el CSV."""
+        try:
+            ruta_csv = self.configuracion.ruta_csv_absoluta(self.raiz_proyecto)
+            return (
+                ruta_parquet.exists()
+                and ruta_csv.exists()
+                and ruta_parquet.stat().st_mtime >= ruta_csv.stat().st_mtime
+            )
+        except OSError:
+            return False
+
+    @staticmethod
+    def _escribir_parquet(tabla: pd.DataFrame, ruta_parquet: Path) -> None:
+        """Escribe el Parquet como mejor esfuerzo: si falla, se ignora."""
+        try:
+            tabla.to_parquet(ruta_parquet, engine="pyarrow", index=False)
+        except Exception:
+            pass
+
     def _leer_csv(self) -> pd.DataFrame:
         """
         Lee el archivo del usuario o el CSV por defecto.
@@ -96,22 +155,139 @@ class FuenteDatosCSV(FuenteDatos):
         'fuente' puede ser:
         - ruta (Path/str)
         - archivo subido por Streamlit (UploadedFile)
+
+        Primero se intenta detectar codificación y separador con una
+        sola lectura de los primeros 64 KB (antes se probaban hasta 8
+        combinaciones, cada una re-parseando el archivo completo). Solo
+        si la detección o la lectura detectada fallan se cae a la matriz
+        de combinaciones.
+
+        Los engines se prueban de más rápido a más tolerante: "pyarrow"
+        (multihilo, ~10-20x más rápido que "python"), luego "c" y solo
+        al final "python" para CSV realmente problemáticos.
         """
-        codificaciones = ["utf-8", "utf-8-sig", "cp1252", "latin-1"]
+        # utf-8-sig primero: también decodifica utf-8 plano y además
+        # se traga el BOM si existe
+        codificaciones = ["utf-8-sig", "utf-8", "cp1252", "latin-1"]
         separadores = [",", ";"]
+        engines = ["pyarrow", "c", "python"]
 
         ultimo_error: Optional[Exception] = None
 
-        for sep in separadores:
-            for enc in codificaciones:
-                try:
-                    # Nota: engine="python" ayuda en algunos CSV problemáticos con separador
-                    return pd.read_csv(fuente, encoding=enc, sep=sep, engine="python")
-                except Exception as e:
-                    ultimo_error = e
+        deteccion = self._detectar_formato(fuente, codificaciones)
+        if deteccion is not None:
+            enc, sep = deteccion
+            try:
+                self._rebobinar(fuente)
+                # dtype_backend="pyarrow": las columnas quedan respaldadas
+                # por buffers Arrow (nulos en bitmap, sin paso por objetos
+                # Python) y el validador puede saltarse el sondeo de tipos
+                # por introspección de dtype
+                return pd.read_csv(
+                    fuente,
+                    encoding=enc,
+                    sep=sep,
+                    engine="pyarrow",
+                    dtype_backend="pyarrow",
+                )
+            except Exception as e:
+                ultimo_error = e
+
+        for engine in engines:
+            for sep in separadores:
+                for enc in codificaciones:
+                    try:
+                        self._rebobinar(fuente)
+                        if engine == "pyarrow":
+                            return pd.read_csv(
+                                fuente,
+                                encoding=enc,
+                                sep=sep,
+                                engine=engine,
+                                dtype_backend="pyarrow",
+                            )
+                        return pd.read_csv(fuente, encoding=enc, sep=sep, engine=engine)
+                    except Exception as e:
+                        ultimo_error = e
 
         # Si nada funcionó, lanzamos el último error con detalle
         if ultimo_error is not None:
             raise ultimo_error
 
         raise ErrorFuenteDatos("No se pudo leer el CSV por un error desconocido.")
+
+    def _detectar_formato(
+        self,
+        fuente: Any,
+        codificaciones: List[str]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        Detecta (codificación, separador) leyendo solo la cabecera del
+        archivo (64 KB). Devuelve None si no se pudo detectar.
+        """
+        try:
+            cabecera = self._leer_cabecera(fuente)
+            if not cabecera:
+                return None
+
+            # Probar primero las codificaciones conocidas sobre la cabecera
+            # (barato: no re-lee el archivo). charset_normalizer queda como
+            # último recurso para codificaciones exóticas — sobre muestras
+            # pequeñas tiende a adivinar de más.
+            enc = None
+            texto = None
+            for candidata in codificaciones:
+                try:
+                    texto = cabecera.decode(candidata)
+                    enc = candidata
+                    break
+                except UnicodeDecodeError:
+                    continue
+
+            if enc is None and _detectar_bytes is not None:
+                mejor = _detectar_bytes(cabecera).best()
+                if mejor is not None:
+                    try:
+                        texto = cabecera.decode(mejor.encoding)
+                        enc = mejor.encoding
+                    except (UnicodeDecodeError, LookupError):
+                        enc = None
+
+            if enc is None or texto is None:
+                return None
+
+            sep = csv.Sniffer().sniff(texto, delimiters=",;").delimiter
+            return enc, sep
+
+        except Exception:
+            return None
+
+    def _leer_cabecera(self, fuente: Any, tamano: int = 65536) -> bytes:
+        """Lee los primeros 'tamano' bytes de la fuente (ruta o file-like)."""
+        if hasattr(fuente, "read"):
+            self._rebobinar(fuente)
+            cabecera = fuente.read(tamano)
+            self._rebobinar(fuente)
+        else:
+            with open(fuente, "rb") as f:
+                cabecera = f.read(tamano)
+
+        # El corte fijo puede partir un carácter multibyte al final de la
+        # muestra; utf-8 fallaría sobre un archivo válido y una
+        # codificación de un byte "acertaría" con mojibake. Recortar a la
+        # última línea completa elimina el byte partido.
+        if len(cabecera) == tamano:
+            fin = cabecera.rfind(b"\n")
+            if fin > 0:
+                cabecera = cabecera[:fin]
+
+        return cabecera
+
+    @staticmethod
+    def _rebobinar(fuente: Any) -> None:
+        """
+        Vuelve al inicio del archivo si 'fuente' es un objeto tipo file
+        (un intento fallido de lectura deja el cursor avanzado).
+        """
+        if hasattr(fuente, "seek"):
+            fuente.seek(0)
@@ -1,10 +1,21 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional
 
+import numpy as np
 import pandas as pd
 
+from nucleo._kernels import suma_agrupada
+
+try:
+    # Opcional: groupby multihilo/SIMD para tablas grandes
+    import polars as pl
+
+    _POLARS_DISPONIBLE = True
+except ImportError:  # pragma: no cover
+    _POLARS_DISPONIBLE = False
+
 
 @dataclass
 class Insight:
@@ -20,6 +31,112 @@ class GeneradorInsights:
     - tabla del periodo anterior
     """
 
+    # A partir de este tamaño la conversión a polars se amortiza y sus
+    # group_by multihilo ganan al kernel de un solo marco por dimensión
+    UMBRAL_FILAS_POLARS = 100_000
+
+    @staticmethod
+    def _sumas_por_grupo(grupos: pd.Series, metricas: Dict[str, np.ndarray]) -> pd.DataFrame:
+        """
+        Suma métricas por grupo con factorize + suma_agrupada (kernel
+        numba multihilo si está disponible, np.bincount si no), sin el
+        hash-groupby ni los DataFrames intermedios de pandas. Para
+        columnas 'category' reutiliza los códigos enteros ya calculados.
+        """
+        if isinstance(grupos.dtype, pd.CategoricalDtype):
+            codigos = grupos.cat.codes.to_numpy()
+            etiquetas = grupos.cat.categories
+        else:
+            codigos, etiquetas = pd.factorize(grupos.to_numpy(), sort=False)
+
+        # factorize/códigos marcan nulos con -1; bincount no los acepta
+        validos = codigos >= 0
+        hay_nulos = not validos.all()
+        if hay_nulos:
+            codigos = codigos[validos]
+
+        datos = {grupos.name: np.asarray(etiquetas)}
+        for nombre, valores in metricas.items():
+            if hay_nulos:
+                valores = valores[validos]
+            datos[nombre] = suma_agrupada(valores, codigos, len(etiquetas))
+
+        return pd.DataFrame(datos)
+
+    def _calcular_agregados(self, tabla: pd.DataFrame) -> Dict[str, object]:
+        """
+        Todos los agregados que consumen los insights, en una sola fase:
+        los ndarrays de ingresos/margen/cantidad se extraen UNA vez y
+        alimentan el total y los tres bincount por dimensión mientras
+        siguen calientes en caché, en vez de que cada sección re-lea las
+        mismas columnas desde el DataFrame.
+
+        En tablas grandes, si polars está instalado, la agregación se
+        delega a sus group_by (multihilo y columnar); el resultado tiene
+        exactamente la misma forma.
+        """
+        if _POLARS_DISPONIBLE and len(tabla) >= self.UMBRAL_FILAS_POLARS:
+            return self._calcular_agregados_polars(tabla)
+
+        ingresos = tabla["ingresos"].to_numpy(dtype=np.float64)
+        margen = tabla["margen"].to_numpy(dtype=np.float64)
+        cantidad = tabla["cantidad"].to_numpy(dtype=np.float64)
+
+        agregados: Dict[str, object] = {
+            "ingresos_total": float(ingresos.sum()),
+            "por_region": None,
+            "por_canal": None,
+            "por_producto": self._sumas_por_grupo(
+                tabla["id_producto"],
+                {"ingresos": ingresos, "margen": margen, "cantidad": cantidad}
+            ),
+        }
+
+        if "region" in tabla.columns and tabla["region"].notna().any():
+            agregados["por_region"] = self._sumas_por_grupo(
+                tabla["region"], {"ingresos": ingresos, "margen": margen}
+            )
+
+        if "canal" in tabla.columns and tabla["canal"].notna().any():
+            agregados["por_canal"] = self._sumas_por_grupo(
+                tabla["canal"], {"ingresos": ingresos, "margen": margen}
+            )
+
+        return agregados
+
+    def _calcular_agregados_polars(self, tabla: pd.DataFrame) -> Dict[str, object]:
+        """
+        Variante polars de _calcular_agregados: una conversión
+        (cero-copia para las columnas numéricas) y un group_by paralelo
+        por dimensión, en vez de kernels de un solo hilo.
+        """
+        columnas = [c for c in ("region", "canal", "id_producto", "ingresos", "margen", "cantidad")
+                    if c in tabla.columns]
+        pl_tabla = pl.from_pandas(tabla[columnas])
+
+        agregados: Dict[str, object] = {
+            "ingresos_total": float(pl_tabla["ingresos"].sum()),
+            "por_region": None,
+            "por_canal": None,
+            "por_producto": (
+                pl_tabla.drop_nulls("id_producto")
+                .group_by("id_producto")
+                .agg(pl.sum("ingresos"), pl.sum("margen"), pl.sum("cantidad"))
+                .to_pandas()
+            ),
+        }
+
+        for dimension, clave in (("region", "por_region"), ("canal", "por_canal")):
+            if dimension in columnas and pl_tabla[dimension].null_count() < len(pl_tabla):
+                agregados[clave] = (
+                    pl_tabla.drop_nulls(dimension)
+                    .group_by(dimension)
+                    .agg(pl.sum("ingresos"), pl.sum("margen"))
+                    .to_pandas()
+                )
+
+        return agregados
+
     def generar(
         self,
         tabla_actual: pd.DataFrame,
@@ -39,8 +156,10 @@ class GeneradorInsights:
                 )
             ]
 
+        agregados = self._calcular_agregados(tabla_actual)
+
         # ---- 1) Ingresos y variación vs periodo anterior ----
-        ingresos_actual = float(tabla_actual["ingresos"].sum())
+        ingresos_actual = agregados["ingresos_total"]
         ingresos_anterior = float(tabla_anterior["ingresos"].sum()) if not tabla_anterior.empty else 0.0
 
         variacion_pct = 0.0
@@ -73,13 +192,10 @@ class GeneradorInsights:
             )
 
         # ---- 2) Región que más aporta ingresos ----
-        if "region" in tabla_actual.columns and tabla_actual["region"].notna().any():
-            por_region = (
-                tabla_actual.groupby("region", as_index=False)
-                .agg(ingresos=("ingresos", "sum"), margen=("margen", "sum"))
-                .sort_values("ingresos", ascending=False)
-            )
-            top_region = por_region.iloc[0]
+        por_region = agregados["por_region"]
+        if por_region is not None and not por_region.empty:
+            # Solo interesa el top-1: argmax es O(G), sin ordenar todo
+            top_region = por_region.iloc[int(por_region["ingresos"].to_numpy().argmax())]
             total_ing = por_region["ingresos"].sum()
             aporte_pct = (top_region["ingresos"] / total_ing) * 100 if total_ing > 0 else 0.0
 
@@ -93,13 +209,9 @@ class GeneradorInsights:
             )
 
         # ---- 3) Canal con mejor rendimiento ----
-        if "canal" in tabla_actual.columns and tabla_actual["canal"].notna().any():
-            por_canal = (
-                tabla_actual.groupby("canal", as_index=False)
-                .agg(ingresos=("ingresos", "sum"), margen=("margen", "sum"))
-                .sort_values("ingresos", ascending=False)
-            )
-            top_canal = por_canal.iloc[0]
+        por_canal = agregados["por_canal"]
+        if por_canal is not None and not por_canal.empty:
+            top_canal = por_canal.iloc[int(por_canal["ingresos"].to_numpy().argmax())]
             insights.append(
                 Insight(
                     titulo="Canal más fuerte",
@@ -110,18 +222,10 @@ class GeneradorInsights:
             )
 
         # ---- 4) Producto líder por ingresos y alerta por margen bajo ----
-        por_producto = (
-            tabla_actual.groupby("id_producto", as_index=False)
-            .agg(
-                ingresos=("ingresos", "sum"),
-                margen=("margen", "sum"),
-                cantidad=("cantidad", "sum")
-            )
-            .sort_values("ingresos", ascending=False)
-        )
+        por_producto = agregados["por_producto"]
 
         if not por_producto.empty:
-            top_prod = por_producto.iloc[0]
+            top_prod = por_producto.iloc[int(por_producto["ingresos"].to_numpy().argmax())]
             margen_pct = (top_prod["margen"] / top_prod["ingresos"] * 100) if top_prod["ingresos"] > 0 else 0.0
 
             tipo_prod = "positivo"
@@ -140,13 +244,13 @@ class GeneradorInsights:
         # ---- 5) Concentración (riesgo): dependencia de 1 producto ----
         if not por_producto.empty:
             total_ingresos = por_producto["ingresos"].sum()
-            share_top = (por_producto.iloc[0]["ingresos"] / total_ingresos) * 100 if total_ingresos > 0 else 0.0
+            share_top = (top_prod["ingresos"] / total_ingresos) * 100 if total_ingresos > 0 else 0.0
             if share_top >= 60:
                 insights.append(
                     Insight(
                         titulo="Riesgo de concentración",
                         mensaje=f"Más del {share_top:.1f}% de los ingresos provienen de un solo producto "
-                                f"(**{por_producto.iloc[0]['id_producto']}**). Considera diversificar.",
+                                f"(**{top_prod['id_producto']}**). Considera diversificar.",
                         tipo="negativo",
                     )
                 )
@@ -7,6 +7,10 @@ import pandas as pd
 
 from nucleo.contratos import EsquemaDatosVentas
 
+# Patrón precompilado a nivel de módulo: evita la búsqueda en el caché
+# interno de 're' en cada nombre de columna
+_ESPACIOS = re.compile(r"\s+")
+
 
 class NormalizadorColumnas:
     """
@@ -16,8 +20,24 @@ class NormalizadorColumnas:
     - ' date ' -> 'date'
     - 'Región' -> 'region'
     - 'qty' -> 'cantidad'
+
+    Además convierte las columnas dimensionales a dtype 'category' en el
+    punto de carga: todo lo que viene después (validación, filtros,
+    groupbys, el caché Parquet) ya trabaja sobre códigos enteros en vez
+    de strings.
     """
 
+    # Columnas dimensionales candidatas a 'category' (si existen)
+    COLUMNAS_CATEGORICAS = (
+        "region",
+        "canal",
+        "id_producto",
+        "id_cliente",
+        "id_orden",
+        "estado",
+        "categoria",
+    )
+
     def __init__(self, esquema: EsquemaDatosVentas):
         self.esquema = esquema
 
@@ -27,13 +47,12 @@ class NormalizadorColumnas:
         Limpieza base:
         - trim
         - minúsculas
-        - quita múltiples espacios
-        - reemplaza espacios por guion bajo (solo si existieran)
+        - colapsa espacios múltiples y los deja como guion bajo
+
+        Una sola sustitución hace ambas cosas (colapsar + reemplazar por
+        '_'), sin el string intermedio del viejo replace().
         """
-        nombre = nombre.strip().lower()
-        nombre = re.sub(r"\s+", " ", nombre)  # colapsa espacios
-        nombre = nombre.replace(" ", "_")
-        return nombre
+        return _ESPACIOS.sub("_", nombre.strip().lower())
 
     def _construir_mapa_renombre(self, columnas_originales) -> Dict[str, str]:
         """
@@ -54,12 +73,21 @@ class NormalizadorColumnas:
 
     def normalizar(self, tabla: pd.DataFrame) -> pd.DataFrame:
         """
-        Devuelve una nueva tabla con columnas normalizadas al estándar.
-        """
-        tabla = tabla.copy()
+        Devuelve la tabla con columnas normalizadas al estándar y las
+        dimensiones convertidas a 'category'.
 
-        # Renombrar según alias
+        Si los nombres ya son estándar no hay renombre que hacer y se
+        trabaja sobre la misma tabla: el copy() incondicional anterior
+        duplicaba todas las columnas incluso en ese caso (rename ya
+        produce un frame nuevo cuando sí hay que renombrar).
+        """
         mapa_renombre = self._construir_mapa_renombre(tabla.columns)
-        tabla = tabla.rename(columns=mapa_renombre)
+
+        if any(original != estandar for original, estandar in mapa_renombre.items()):
+            tabla = tabla.rename(columns=mapa_renombre)
+
+        for col in self.COLUMNAS_CATEGORICAS:
+            if col in tabla.columns:
+                tabla[col] = tabla[col].astype("category")
 
         return tabla
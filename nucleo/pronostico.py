@@ -5,7 +5,22 @@ from typing import Tuple
 
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
+
+
+@dataclass
+class ModeloLinealSimple:
+    """
+    Recta ajustada por mínimos cuadrados: y = pendiente * x + interseccion.
+
+    Para una sola variable el ajuste tiene forma cerrada, así que no hace
+    falta cargar sklearn (su LinearRegression valida, copia y delega en
+    lstsq para terminar calculando exactamente esta recta).
+    """
+    pendiente: float
+    interseccion: float
+
+    def predecir(self, x: np.ndarray) -> np.ndarray:
+        return x * self.pendiente + self.interseccion
 
 
 @dataclass
@@ -16,7 +31,7 @@ class ResultadoPronostico:
     - modelo: modelo entrenado (por si luego quieres métricas)
     """
     tabla: pd.DataFrame
-    modelo: LinearRegression
+    modelo: ModeloLinealSimple
 
 
 class PronosticadorVentasLineal:
@@ -40,26 +55,38 @@ class PronosticadorVentasLineal:
         if tabla.empty:
             raise ValueError("No hay datos para generar pronóstico.")
 
-        # 1) Agregar ingresos por día
+        # 1) Agregar ingresos por día. La tabla llega ordenada por fecha
+        # desde la carga, así que groupby(sort=True) produce los días ya
+        # en orden sin el sort_values posterior sobre el resultado.
         diario = (
-            tabla.groupby("fecha", as_index=False)
+            tabla.groupby("fecha", as_index=False, sort=True, observed=True)
             .agg(ingresos=("ingresos", "sum"))
-            .sort_values("fecha")
         )
 
-        # 2) Convertir fechas a índice numérico
-        diario["dia_idx"] = np.arange(len(diario))
-
-        X = diario[["dia_idx"]]
-        y = diario["ingresos"]
-
-        # 3) Entrenar modelo
-        modelo = LinearRegression()
-        modelo.fit(X, y)
+        # 2) Ajustar la recta sobre el índice de día 0..n-1 en forma
+        # cerrada: pendiente = cov(x, y) / var(x). Con x = arange(n) la
+        # media y la varianza tienen expresión exacta, así que solo se
+        # recorre 'y' dos veces, sin copias ni validaciones de sklearn.
+        n = len(diario)
+        y = diario["ingresos"].to_numpy(dtype=np.float64)
+
+        media_y = y.mean()
+        if n > 1:
+            x = np.arange(n, dtype=np.float64)
+            media_x = (n - 1) / 2.0
+            # var(arange(n)) * n = n * (n² - 1) / 12
+            pendiente = float(((x - media_x) * (y - media_y)).sum() / (n * (n * n - 1) / 12.0))
+        else:
+            media_x = 0.0
+            pendiente = 0.0  # un solo día: recta plana
+
+        modelo = ModeloLinealSimple(
+            pendiente=pendiente,
+            interseccion=float(media_y - pendiente * media_x),
+        )
 
-        # 4) Crear rango futuro
-        ultimo_idx = diario["dia_idx"].max()
-        idx_futuro = np.arange(ultimo_idx + 1, ultimo_idx + dias_futuros + 1)
+        # 3) Crear rango futuro
+        idx_futuro = np.arange(n, n + dias_futuros, dtype=np.float64)
 
         fechas_futuras = pd.date_range(
             start=diario["fecha"].max() + pd.Timedelta(days=1),
@@ -67,20 +94,28 @@ class PronosticadorVentasLineal:
             freq="D"
         )
 
-        # 5) Predecir
-        ingresos_futuros = modelo.predict(idx_futuro.reshape(-1, 1))
+        # 4) Predecir
+        ingresos_futuros = modelo.predecir(idx_futuro)
+
+        # 5) Unir real + pronóstico. El largo final se conoce de
+        # antemano, así que cada columna se reserva una vez y se rellena
+        # por tramos, en vez de armar dos DataFrames y pagar el concat
+        # (que copia ambos en arrays nuevos).
+        total = n + dias_futuros
+
+        fechas = np.empty(total, dtype="datetime64[ns]")
+        fechas[:n] = diario["fecha"].to_numpy()
+        fechas[n:] = fechas_futuras.to_numpy()
 
-        # 6) Unir real + pronóstico
-        tabla_real = diario[["fecha", "ingresos"]].copy()
-        tabla_real["tipo"] = "Real"
+        ingresos = np.empty(total, dtype=np.float64)
+        ingresos[:n] = y
+        ingresos[n:] = ingresos_futuros
 
-        tabla_futura = pd.DataFrame({
-            "fecha": fechas_futuras,
-            "ingresos": ingresos_futuros,
-            "tipo": "Pronóstico"
-        })
+        tipo = np.empty(total, dtype=object)
+        tipo[:n] = "Real"
+        tipo[n:] = "Pronóstico"
 
-        tabla_final = pd.concat([tabla_real, tabla_futura], ignore_index=True)
+        tabla_final = pd.DataFrame({"fecha": fechas, "ingresos": ingresos, "tipo": tipo})
 
         return ResultadoPronostico(
             tabla=tabla_final,
@@ -3,7 +3,9 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional, List
 
+import numpy as np
 import pandas as pd
+from pandas.tseries.api import guess_datetime_format
 
 from nucleo.contratos import EsquemaDatosVentas, ResultadoValidacion
 from nucleo.configuracion import ConfiguracionAplicacion
@@ -15,25 +17,63 @@ class ValidadorEsquemaCSV:
     - Columnas requeridas
     - Tipos convertibles (fecha y numéricos)
     - Límites (max filas) para evitar problemas de memoria
+
+    Nota: en archivos grandes los chequeos de convertibilidad se hacen
+    sobre una muestra (primeras filas + muestra aleatoria), no sobre la
+    columna completa. La validación es probabilística — su trabajo es
+    rechazar archivos malformados rápido; la conversión estricta ocurre
+    después en el pipeline de limpieza (LimpiadorDatos).
+
+    Contrato: si 'fecha' es convertible, 'validar' la deja ya parseada
+    en la tabla recibida (misma filosofía consume-entrada que el ETL),
+    para que el escaneo de strings de fechas se pague una sola vez.
     """
 
+    # Tamaño de la muestra usada para sondear convertibilidad
+    FILAS_SONDEO = 20_000
+
     def __init__(self, esquema: EsquemaDatosVentas, config: ConfiguracionAplicacion):
         self.esquema = esquema
         self.config = config
 
+    # Columnas numéricas del esquema sujetas a chequeos de tipo y rango
+    COLUMNAS_NUMERICAS = ("cantidad", "precio", "costo")
+
     def validar(self, tabla: pd.DataFrame) -> ResultadoValidacion:
+        """
+        Validación por etapas con corte temprano: cada etapa solo corre
+        si las anteriores pasaron. Un archivo que ya está rechazado (por
+        tamaño, columnas o tipos) no paga los chequeos posteriores — los
+        de rango solo tienen sentido sobre columnas que sí convirtieron.
+        """
         errores: List[str] = []
         advertencias: List[str] = []
 
-        # 1) Validar tamaño
+        if not self._validar_tamano(tabla, errores):
+            return ResultadoValidacion(es_valido=False, errores=errores, advertencias=advertencias)
+
+        if not self._validar_columnas(tabla, errores):
+            return ResultadoValidacion(es_valido=False, errores=errores, advertencias=advertencias)
+
+        numericas_convertidas = self._validar_tipos(tabla, errores)
+        if errores:
+            return ResultadoValidacion(es_valido=False, errores=errores, advertencias=advertencias)
+
+        self._validar_rangos(numericas_convertidas, advertencias)
+        return ResultadoValidacion(es_valido=True, errores=errores, advertencias=advertencias)
+
+    def _validar_tamano(self, tabla: pd.DataFrame, errores: List[str]) -> bool:
+        """Etapa 1: límite de filas (protege la memoria del proceso)."""
         if len(tabla) > self.config.max_filas_csv:
             errores.append(
                 f"El archivo tiene {len(tabla):,} filas y excede el máximo permitido "
                 f"({self.config.max_filas_csv:,}). Usa un archivo más pequeño o filtra los datos."
             )
-            return ResultadoValidacion(es_valido=False, errores=errores, advertencias=advertencias)
+            return False
+        return True
 
-        # 2) Validar columnas requeridas
+    def _validar_columnas(self, tabla: pd.DataFrame, errores: List[str]) -> bool:
+        """Etapa 2: columnas requeridas presentes."""
         columnas_presentes = set(tabla.columns)
         faltantes = [c for c in self.esquema.columnas_requeridas if c not in columnas_presentes]
         if faltantes:
@@ -42,59 +82,158 @@ class ValidadorEsquemaCSV:
                 + ", ".join(faltantes)
                 + "."
             )
-
-        # Si faltan columnas críticas, no vale la pena seguir con tipos
-        if errores:
-            return ResultadoValidacion(es_valido=False, errores=errores, advertencias=advertencias)
-
-        # 3) Validar que 'fecha' sea convertible
-        if not self._columna_fecha_convertible(tabla, "fecha"):
+            return False
+        return True
+
+    def _validar_tipos(self, tabla: pd.DataFrame, errores: List[str]) -> dict:
+        """
+        Etapa 3: convertibilidad de tipos. Devuelve las series numéricas
+        ya convertidas (muestras de sondeo) para que la etapa de rangos
+        las reutilice sin re-coercionar.
+
+        Fecha: si es convertible, la columna completa se deja ya
+        parseada en la tabla — el parseo de fechas es un escaneo de
+        strings caro y así ocurre exactamente una vez (LimpiadorDatos
+        detecta el dtype datetime y no vuelve a parsear).
+
+        Numéricos: una sola coerción por columna sobre la muestra de
+        sondeo. errors="raise" escaneaba hasta el primer valor malo y
+        pagaba una excepción; con "coerce" la serie convertida y el
+        diagnóstico salen de la misma pasada. Columnas que ya llegan
+        con dtype numérico (backend pyarrow) no se sondean: la
+        convertibilidad es un hecho del dtype.
+        """
+        fechas = self._convertir_columna_fecha(tabla["fecha"])
+        if fechas is None:
             errores.append(
                 "La columna 'fecha' no se pudo convertir a formato fecha. "
                 "Asegúrate de que tenga valores como '2025-01-31' o '31/01/2025'."
             )
-
-        # 4) Validar numéricos (cantidad, precio, costo)
-        for col_num in ["cantidad", "precio", "costo"]:
-            if not self._columna_numerica_convertible(tabla, col_num):
+        else:
+            tabla["fecha"] = fechas
+
+        numericas_convertidas: dict = {}
+        for col_num in self.COLUMNAS_NUMERICAS:
+            serie = tabla[col_num]
+            if pd.api.types.is_numeric_dtype(serie):
+                numericas_convertidas[col_num] = self._muestra_para_sondeo(serie)
+                continue
+            convertida, tiene_invalidos = self._convertir_numerica(
+                self._muestra_para_sondeo(serie)
+            )
+            if tiene_invalidos:
                 errores.append(
                     f"La columna '{col_num}' no se pudo convertir a número. "
                     "Revisa que no tenga texto o símbolos."
                 )
-
-        # 5) Advertencias útiles (no bloquean)
-        if tabla["cantidad"].isna().any():
-            advertencias.append("Hay valores vacíos en 'cantidad'. Se tratarán como 0 si se limpia el dataset.")
-        if tabla["precio"].isna().any():
-            advertencias.append("Hay valores vacíos en 'precio'. Se tratarán como 0 si se limpia el dataset.")
-        if tabla["costo"].isna().any():
-            advertencias.append("Hay valores vacíos en 'costo'. Se tratarán como 0 si se limpia el dataset.")
-
-        # 6) Validaciones de sentido (básicas)
-        if (tabla["cantidad"] < 0).any():
-            advertencias.append("Se detectaron cantidades negativas. Revisa si son devoluciones o errores.")
-        if (tabla["precio"] < 0).any():
-            advertencias.append("Se detectaron precios negativos. Revisa el CSV.")
-        if (tabla["costo"] < 0).any():
-            advertencias.append("Se detectaron costos negativos. Revisa el CSV.")
-
-        es_valido = len(errores) == 0
-        return ResultadoValidacion(es_valido=es_valido, errores=errores, advertencias=advertencias)
-
-    def _columna_fecha_convertible(self, tabla: pd.DataFrame, columna: str) -> bool:
+            else:
+                numericas_convertidas[col_num] = convertida
+
+        return numericas_convertidas
+
+    def _validar_rangos(self, numericas_convertidas: dict, advertencias: List[str]) -> None:
+        """
+        Etapa 4: advertencias de vacíos y de signo (no bloquean) en una
+        sola reducción 2D: las series convertidas se apilan en una matriz
+        (n, 3) y los chequeos por columna salen de un isnan y un min
+        vectorizados, en vez de una pasada booleana por serie y chequeo.
+        """
+        mensajes_negativos = {
+            "cantidad": "Se detectaron cantidades negativas. Revisa si son devoluciones o errores.",
+            "precio": "Se detectaron precios negativos. Revisa el CSV.",
+            "costo": "Se detectaron costos negativos. Revisa el CSV.",
+        }
+        columnas_ok = [c for c in self.COLUMNAS_NUMERICAS if c in numericas_convertidas]
+        if not columnas_ok:
+            return
+
+        matriz = np.column_stack(
+            [numericas_convertidas[c].to_numpy(dtype=np.float64) for c in columnas_ok]
+        )
+        nulos = np.isnan(matriz)
+        con_vacios = nulos.any(axis=0)
+        # min puro se envenena con NaN; la máscara de nulos ya está
+        # calculada, así que se reutiliza para neutralizarlos con 0
+        con_negativos = np.where(nulos, 0.0, matriz).min(axis=0) < 0
+
+        for i, col_num in enumerate(columnas_ok):
+            if con_vacios[i]:
+                advertencias.append(
+                    f"Hay valores vacíos en '{col_num}'. Se tratarán como 0 si se limpia el dataset."
+                )
+            if con_negativos[i]:
+                advertencias.append(mensajes_negativos[col_num])
+
+    @classmethod
+    def _muestra_para_sondeo(cls, serie: pd.Series) -> pd.Series:
+        """
+        Muestra para sondear convertibilidad: la serie completa si es
+        pequeña; si no, las primeras filas más una muestra aleatoria
+        (semilla fija para resultados reproducibles). Así la validación
+        cuesta O(FILAS_SONDEO) sin importar el tamaño del archivo.
+        """
+        n = cls.FILAS_SONDEO
+        if len(serie) <= n:
+            return serie
+        return pd.concat([serie.head(n // 2), serie.sample(n // 2, random_state=0)])
+
+    def _convertir_columna_fecha(self, serie: pd.Series) -> Optional[pd.Series]:
+        """
+        Sondea convertibilidad sobre la muestra (fail-fast en archivos
+        malformados) y, si pasa, parsea la columna COMPLETA una vez y la
+        devuelve para que el resto del pipeline la reutilice. Los valores
+        sueltos que no parsean quedan en NaT; LimpiadorDatos ya los
+        cuenta y elimina con advertencia.
+        """
+        if isinstance(serie.dtype, np.dtype) and serie.dtype.kind == "M":
+            return serie
+
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            # Fecha respaldada por Arrow (date32/timestamp del lector):
+            # ya está parseada, pero el resto del pipeline compara contra
+            # Timestamps numpy y un date32 no es comparable con ellos;
+            # normalizar a datetime64[ns]
+            return serie.astype("datetime64[ns]")
+
+        muestra = self._muestra_para_sondeo(serie)
         try:
             if self.config.formato_fecha:
-                pd.to_datetime(tabla[columna], format=self.config.formato_fecha, errors="raise")
+                pd.to_datetime(muestra, format=self.config.formato_fecha, errors="raise")
             else:
-                pd.to_datetime(tabla[columna], errors="raise")
-            return True
+                pd.to_datetime(muestra, errors="raise")
         except Exception:
-            return False
+            return None
+
+        if self.config.formato_fecha:
+            return pd.to_datetime(serie, format=self.config.formato_fecha, errors="coerce", cache=True)
+
+        # Sin formato configurado: adivinarlo del primer valor no nulo y
+        # aplicarlo explícito — el parseo con formato conocido es mucho
+        # más rápido que la inferencia valor a valor. Si el archivo
+        # mezcla formatos el parseo explícito deja NaT nuevos; en ese
+        # caso se cae a la inferencia completa.
+        sin_nulos = serie.dropna()
+        formato = guess_datetime_format(str(sin_nulos.iloc[0])) if not sin_nulos.empty else None
+        if formato is not None:
+            fechas = pd.to_datetime(serie, format=formato, errors="coerce", cache=True)
+            if fechas.isna().sum() == serie.isna().sum():
+                return fechas
+        return pd.to_datetime(serie, errors="coerce", cache=True)
 
     @staticmethod
-    def _columna_numerica_convertible(tabla: pd.DataFrame, columna: str) -> bool:
-        try:
-            pd.to_numeric(tabla[columna], errors="raise")
-            return True
-        except Exception:
-            return False
+    def _convertir_numerica(serie: pd.Series) -> tuple[pd.Series, bool]:
+        """
+        Convierte la serie a numérico en una sola pasada.
+
+        Devuelve (serie_convertida, tiene_invalidos): un valor es
+        inválido si no era nulo pero la coerción lo dejó en NaN.
+
+        El diagnóstico va por np.isnan sobre float64 numpy: con entrada
+        de backend Arrow la coerción deja NaN que el isna() de Arrow NO
+        reporta (distingue NaN de nulo), y los inválidos pasarían sin
+        detectar.
+        """
+        convertida = pd.to_numeric(serie, errors="coerce")
+        valores = convertida.to_numpy(dtype=np.float64, na_value=np.nan)
+        nuevos_nulos = np.isnan(valores) & serie.notna().to_numpy()
+        return convertida, bool(nuevos_nulos.any())